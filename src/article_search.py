@@ -0,0 +1,84 @@
+import sqlite3
+import re
+
+# bm25 weights for title, meta_title and cleaned_content (keyword isn't indexed)
+TITLE_WEIGHT = 10.0
+META_TITLE_WEIGHT = 5.0
+CONTENT_WEIGHT = 1.0
+
+# Shorter words are mostly stopwords ("de", "la", "con"...) and only add noise
+MIN_TERM_LENGTH = 4
+
+
+class ArticleSearchIndex:
+    connection: sqlite3.Connection
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.connection = connection
+
+    def get_related_keywords(self, keyword: str, k: int = 5) -> list[str]:
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("""
+        SELECT a.title, a.meta_title FROM article_completions a WHERE a.keyword = $1
+      """, (keyword,))
+            article = cursor.fetchone()
+
+            if article is None:
+                return []
+
+            return self.__search_related(cursor, keyword, article[0], article[1], k)
+        finally:
+            cursor.close()
+
+    def get_link_suggestions(self, k: int = 5) -> dict[str, list[str]]:
+        """
+        Computes the top `k` related keywords of every succeded article, to be
+        used as internal links.
+        """
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("""
+        SELECT a.keyword, a.title, a.meta_title FROM article_completions a WHERE a.errors IS NULL
+      """)
+            articles = cursor.fetchall()
+
+            suggestions = dict[str, list[str]]()
+            for keyword, title, meta_title in articles:
+                suggestions[keyword] = self.__search_related(
+                    cursor, keyword, title, meta_title, k)
+
+            return suggestions
+        finally:
+            cursor.close()
+
+    def __search_related(self, cursor: sqlite3.Cursor, keyword: str, title: str, meta_title: str, k: int) -> list[str]:
+        match_query = build_match_query(
+            [keyword, title or "", meta_title or ""])
+
+        if match_query is None:
+            return []
+
+        cursor.execute("""
+        SELECT a.keyword FROM article_completions_fts f
+        JOIN article_completions a ON a.keyword = f.keyword
+        WHERE article_completions_fts MATCH $1 AND a.keyword != $2 AND a.errors IS NULL
+        ORDER BY bm25(article_completions_fts, 0.0, $3, $4, $5)
+        LIMIT $6
+      """, (match_query, keyword, TITLE_WEIGHT, META_TITLE_WEIGHT, CONTENT_WEIGHT, k))
+
+        return list(map(lambda x: x[0], cursor.fetchall()))
+
+
+def build_match_query(texts: list[str]) -> str | None:
+    terms: list[str] = []
+    for text in texts:
+        for term in re.findall(r"\w+", text.lower()):
+            if len(term) >= MIN_TERM_LENGTH and term not in terms:
+                terms.append(term)
+
+    if len(terms) == 0:
+        return None
+
+    # Quote every term so FTS5 doesn't parse words like "NOT" as operators
+    return " OR ".join(map(lambda x: f'"{x}"', terms))
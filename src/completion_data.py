@@ -53,6 +53,7 @@ class CompletionData:
     meta_desc: str
     img_url: str
     img_attribution_username: str
+    img_local_paths: Optional[dict[int, str]]
     errors: list[CompletionError]
     used_prompts: CompletionPrompts
 
@@ -68,7 +69,7 @@ class CompletionDataDB:
         with self.connection as cursor:
             cursor.execute("""
         INSERT INTO article_completions VALUES
-        ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
+        ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
       """, persistence)
 
     def update_completion_data(self, data: CompletionData):
@@ -76,9 +77,9 @@ class CompletionDataDB:
         with self.connection as cursor:
             cursor.execute(f"""
         UPDATE article_completions
-        SET title = $1, raw_content = $2, cleaned_content = $3, meta_title = $4, meta_desc = $5, img_url = $6, img_attribution_username = $7, errors = $8, prompts = $9
+        SET title = $1, raw_content = $2, cleaned_content = $3, meta_title = $4, meta_desc = $5, img_url = $6, img_attribution_username = $7, errors = $8, prompts = $9, img_local_paths = $10
         WHERE keyword = '{data.completion_input.keyword}'
-      """, (data.title, data.raw_content, data.cleaned_content, data.meta_title, data.meta_desc, data.img_url, data.img_attribution_username, persistence[10], persistence[11]))
+      """, (data.title, data.raw_content, data.cleaned_content, data.meta_title, data.meta_desc, data.img_url, data.img_attribution_username, persistence[10], persistence[11], persistence[12]))
 
     def get_by_keyword(self, keyword: str) -> Optional[CompletionData]:
         cursor = self.connection.cursor()
@@ -152,6 +153,10 @@ def map_to_domain(article) -> CompletionData:
         meta_title=prompts_json["meta_title"],
     )
 
+    # JSON object keys are always strings, widths are stored as "480", "800"...
+    img_local_paths = {int(width): path for width, path in json.loads(
+        article[12]).items()} if article[12] is not None else None
+
     return CompletionData(
         CompletionInput(article[0], article[1]),
         article[2],
@@ -162,6 +167,7 @@ def map_to_domain(article) -> CompletionData:
         article[7],
         article[8],
         article[9],
+        img_local_paths,
         errors,
         prompts
     )
@@ -175,6 +181,9 @@ def map_to_persistence(article: CompletionData):
 
     prompts_json_o = json.dumps({"prompts": article.used_prompts.__dict__})
 
+    img_local_paths_o = json.dumps(
+        article.img_local_paths) if article.img_local_paths is not None else None
+
     return (
         article.completion_input.keyword,
         article.completion_input.category,
@@ -187,5 +196,6 @@ def map_to_persistence(article: CompletionData):
         article.img_url,
         article.img_attribution_username,
         json_o,
-        prompts_json_o
+        prompts_json_o,
+        img_local_paths_o
     )
@@ -0,0 +1,40 @@
+import os
+from dotenv import load_dotenv
+import asyncio
+import article_search
+import sqlite
+import csv
+
+CSV_HEADERS = [
+    "keyword",
+    "related_keywords"
+]
+
+GENERATED_DIR_PATH = "generated"
+GENERATED_FILE_NAME = "link_suggestions.csv"
+SUGGESTIONS_PER_ARTICLE = 5
+
+
+async def main():
+    load_dotenv()
+
+    connection = sqlite.get_sqlite_connection()
+    sqlite.run_migrations(connection)
+
+    search_index = article_search.ArticleSearchIndex(connection)
+
+    suggestions = search_index.get_link_suggestions(SUGGESTIONS_PER_ARTICLE)
+
+    if not os.path.exists(GENERATED_DIR_PATH):
+        os.makedirs(GENERATED_DIR_PATH)
+    with open(f"{GENERATED_DIR_PATH}/{GENERATED_FILE_NAME}", "w", encoding="utf-8") as f:
+        writer = csv.writer(f)
+
+        writer.writerow(CSV_HEADERS)
+        for keyword, related_keywords in suggestions.items():
+            writer.writerow([
+                keyword,
+                "|".join(related_keywords)
+            ])
+
+asyncio.run(main())
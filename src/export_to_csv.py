@@ -4,6 +4,7 @@ import asyncio
 import completion_data
 import sqlite
 import csv
+import json
 
 CSV_HEADERS = [
     "keyword",
@@ -15,7 +16,8 @@ CSV_HEADERS = [
     "cleaned_content",
     "html_content",
     "img_url",
-    "img_attribution_username"
+    "img_attribution_username",
+    "img_local_paths"
 ]
 
 GENERATED_DIR_PATH = "generated"
@@ -49,7 +51,8 @@ async def main():
                 article.cleaned_content,
                 article.html_content,
                 article.img_url,
-                article.img_attribution_username
+                article.img_attribution_username,
+                json.dumps(article.img_local_paths) if article.img_local_paths is not None else None
             ])
 
 asyncio.run(main())
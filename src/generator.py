@@ -1,5 +1,5 @@
 import os
-from typing import Callable, TypeVar, Any
+from typing import Callable, TypeVar, Any, Optional
 import requests
 from dataclasses import dataclass
 import ia_generator
@@ -9,6 +9,9 @@ from concurrent import futures
 import asyncio
 import completion_data
 import config
+import hedging
+import model_router
+import image_pipeline
 from collections.abc import Coroutine
 
 
@@ -19,6 +22,9 @@ class CompletionsConfig:
     content_prompt_pipe: Callable[[completion_data.CompletionInput], str]
     meta_title_prompt_pipe: Callable[[completion_data.CompletionInput], str]
     meta_desc_prompt_pipe: Callable[[completion_data.CompletionInput], str]
+    model_routing: model_router.ModelRoutingConfig
+    hedging_config: Optional[hedging.HedgingConfig] = None
+    image_optimization: Optional[image_pipeline.ImageOptimizationConfig] = None
 
 
 sem = asyncio.Semaphore(4)
@@ -30,6 +36,9 @@ class ArticleGenerator:
     category_dict: dict[str, str]
     completion_config: CompletionsConfig
     service_config: config.ServiceConfig
+    model_router: model_router.ModelRouter
+    content_hedger: Optional[hedging.HedgedRequestRunner]
+    image_pipeline: Optional[image_pipeline.ImagePipeline]
 
     def __init__(self, openai_service: ia_generator.OpenAICompletionService, completion_db: completion_data.CompletionDataDB, category_dict: dict[str, str], completion_config: CompletionsConfig, service_config: config.ServiceConfig) -> None:
         self.openai_service = openai_service
@@ -37,11 +46,21 @@ class ArticleGenerator:
         self.completion_config = completion_config
         self.completion_db = completion_db
         self.service_config = service_config
+        self.model_router = model_router.ModelRouter(
+            completion_config.model_routing)
+        self.content_hedger = hedging.HedgedRequestRunner(
+            completion_config.hedging_config) if completion_config.hedging_config is not None else None
+        self.image_pipeline = image_pipeline.ImagePipeline(
+            completion_config.image_optimization, completion_db.connection) if completion_config.image_optimization is not None else None
 
     async def start_generation(self, inputs: list[completion_data.CompletionInput]):
-        await asyncio.gather(
-            *[self.__safe_generate_article_async(input) for input in inputs]
-        )
+        try:
+            await asyncio.gather(
+                *[self.__safe_generate_article_async(input) for input in inputs]
+            )
+        finally:
+            self.__shutdown_image_pipeline()
+        self.__print_hedging_stats()
 
     async def regenerate_articles(self):
         failed_articles = self.completion_db.get_failed()
@@ -50,9 +69,24 @@ class ArticleGenerator:
             print("No failed articles to re-generate :)")
             return
 
-        await asyncio.gather(
-            *[self.__safe_regen_article(article) for article in failed_articles]
-        )
+        try:
+            await asyncio.gather(
+                *[self.__safe_regen_article(article) for article in failed_articles]
+            )
+        finally:
+            self.__shutdown_image_pipeline()
+        self.__print_hedging_stats()
+
+    def __shutdown_image_pipeline(self):
+        if self.image_pipeline is not None:
+            self.image_pipeline.shutdown()
+
+    def __print_hedging_stats(self):
+        if self.content_hedger is None:
+            return
+
+        print(
+            f"[HEDGING] {self.content_hedger.hedges_sent} hedges sent, {self.content_hedger.hedges_won} won, {self.content_hedger.hedged_tokens}/{self.content_hedger.primary_tokens} extra tokens budgeted")
 
     async def __safe_generate_article_async(self, input: completion_data.CompletionInput):
         async with sem:
@@ -75,7 +109,7 @@ class ArticleGenerator:
 
         for error in article.errors:
             if error.error_type == completion_data.CompletionErrorType.CONTENT:
-                raw_content = await generate_article_content(self.openai_service, content_prompt)
+                raw_content = await generate_article_content(self.openai_service, self.model_router, content_prompt, self.content_hedger)
 
                 match raw_content:
                     case completion_data.CompletionError():
@@ -86,7 +120,7 @@ class ArticleGenerator:
                             raw_content)
 
             if error.error_type == completion_data.CompletionErrorType.META_DESC:
-                meta_desc = await generate_meta_desc(self.openai_service, meta_desc_prompt)
+                meta_desc = await generate_meta_desc(self.openai_service, self.model_router, meta_desc_prompt)
 
                 match meta_desc:
                     case completion_data.CompletionError():
@@ -95,7 +129,7 @@ class ArticleGenerator:
                         article.meta_desc = meta_desc
 
             if error.error_type == completion_data.CompletionErrorType.META_TITLE:
-                meta_title = await generate_meta_title(self.openai_service, meta_title_prompt)
+                meta_title = await generate_meta_title(self.openai_service, self.model_router, meta_title_prompt)
 
                 match meta_title:
                     case completion_data.CompletionError():
@@ -103,8 +137,18 @@ class ArticleGenerator:
                     case str():
                         article.meta_title = meta_title
 
-            if error.error_type == completion_data.CompletionErrorType.IMG:
-                img = await get_img_url(self.service_config.unsplash_config, article.completion_input, self.category_dict)
+            # Only the local optimization failed, keep the image already picked
+            if error.error_type == completion_data.CompletionErrorType.IMG and article.img_url is not None and self.image_pipeline is not None:
+                img_local_paths = await optimize_img(self.image_pipeline, article.img_url)
+
+                match img_local_paths:
+                    case completion_data.CompletionError():
+                        new_errors.append(img_local_paths)
+                    case _:
+                        article.img_local_paths = img_local_paths
+
+            elif error.error_type == completion_data.CompletionErrorType.IMG:
+                img, img_local_paths = await self.__get_img(article.completion_input)
 
                 match img:
                     case completion_data.CompletionError():
@@ -113,6 +157,12 @@ class ArticleGenerator:
                         article.img_url = img[0]
                         article.img_attribution_username = img[1]
 
+                match img_local_paths:
+                    case completion_data.CompletionError():
+                        new_errors.append(img_local_paths)
+                    case _:
+                        article.img_local_paths = img_local_paths
+
             article.errors = new_errors if len(new_errors) > 0 else None
             self.completion_db.update_completion_data(article)
 
@@ -138,15 +188,15 @@ class ArticleGenerator:
         meta_desc_prompt = self.completion_config.meta_desc_prompt_pipe(input)
         content_prompt = self.completion_config.content_prompt_pipe(input)
 
-        metatitle, metadesc, raw_content, img_data = await asyncio.gather(
-            generate_meta_title(self.openai_service, meta_title_prompt),
-            generate_meta_desc(self.openai_service, meta_desc_prompt),
-            generate_article_content(self.openai_service, content_prompt),
-            get_img_url(self.service_config.unsplash_config,
-                        input, self.category_dict),
+        metatitle, metadesc, raw_content, (img_data, img_local_paths) = await asyncio.gather(
+            generate_meta_title(self.openai_service, self.model_router, meta_title_prompt),
+            generate_meta_desc(self.openai_service, self.model_router, meta_desc_prompt),
+            generate_article_content(self.openai_service, self.model_router, content_prompt, self.content_hedger),
+            self.__get_img(input),
         )
 
-        errors = collect_errors([metatitle, metadesc, raw_content, img_data])
+        errors = collect_errors(
+            [metatitle, metadesc, raw_content, img_data, img_local_paths])
 
         self.completion_db.save_completion_data(
             completion_data.CompletionData(
@@ -165,6 +215,7 @@ class ArticleGenerator:
                     img_data) is not None else None,
                 img_attribution_username=img_data[1] if error_or_none(
                     img_data) is not None else None,
+                img_local_paths=error_or_none(img_local_paths),
                 errors=errors if len(errors) > 0 else None,
                 used_prompts=completion_data.CompletionPrompts(
                     content=content_prompt,
@@ -181,6 +232,14 @@ class ArticleGenerator:
             print(
                 f"[OK] Article completion generated sucessfuly for keyword {input.keyword}")
 
+    async def __get_img(self, input: completion_data.CompletionInput) -> tuple[tuple[str, str] | completion_data.CompletionError, Optional[dict[int, str]] | completion_data.CompletionError]:
+        img_data = await get_img_url(self.service_config.unsplash_config, input, self.category_dict)
+
+        if self.image_pipeline is None or error_or_none(img_data) is None:
+            return img_data, None
+
+        return img_data, await optimize_img(self.image_pipeline, img_data[0])
+
 
 T = TypeVar("T")
 
@@ -217,29 +276,50 @@ def article_content_to_html(content: str) -> str:
     return markdown.markdown(content)
 
 
-async def generate_meta_desc(openai_service: ia_generator.OpenAICompletionService, prompt: str) -> str | completion_data.CompletionError:
+async def generate_meta_desc(openai_service: ia_generator.OpenAICompletionService, router: model_router.ModelRouter, prompt: str) -> str | completion_data.CompletionError:
     try:
-        return await openai_service.generate_completion(prompt, max_tokens=100)
+        return await router.complete(
+            model_router.CompletionTask.META_DESC,
+            lambda model: openai_service.generate_completion(prompt, max_tokens=100, model=model))
     except Exception as e:
         return completion_data.CompletionError(completion_data.CompletionErrorType.META_DESC, str(e))
 
 
-async def generate_article_content(openai_service: ia_generator.OpenAICompletionService, prompt: str) -> str | completion_data.CompletionError:
+async def generate_article_content(openai_service: ia_generator.OpenAICompletionService, router: model_router.ModelRouter, prompt: str, hedger: Optional[hedging.HedgedRequestRunner] = None) -> str | completion_data.CompletionError:
     try:
-        completion = await openai_service.generate_completion(prompt, max_tokens=3711, temperature=0.5, presence_penalty=0.8)
+        max_tokens = 3711
+
+        def request(model: str, on_attempt: Optional[Callable[[int], bool]] = None):
+            return openai_service.generate_completion(prompt, max_tokens=max_tokens, temperature=0.5, presence_penalty=0.8, model=model, on_attempt=on_attempt)
+
+        def hedged_request(model: str):
+            return hedger.run(lambda on_attempt: request(model, on_attempt), max_tokens)
+
+        completion = await router.complete(
+            model_router.CompletionTask.CONTENT,
+            hedged_request if hedger is not None else request)
 
         return completion
     except Exception as e:
         return completion_data.CompletionError(completion_data.CompletionErrorType.CONTENT, str(e))
 
 
-async def generate_meta_title(openai_service: ia_generator.OpenAICompletionService, prompt: str) -> str | completion_data.CompletionError:
+async def generate_meta_title(openai_service: ia_generator.OpenAICompletionService, router: model_router.ModelRouter, prompt: str) -> str | completion_data.CompletionError:
     try:
-        return await openai_service.generate_completion(prompt, max_tokens=45)
+        return await router.complete(
+            model_router.CompletionTask.META_TITLE,
+            lambda model: openai_service.generate_completion(prompt, max_tokens=45, model=model))
     except Exception as e:
         return completion_data.CompletionError(completion_data.CompletionErrorType.META_TITLE, str(e))
 
 
+async def optimize_img(pipeline: image_pipeline.ImagePipeline, img_url: str) -> dict[int, str] | completion_data.CompletionError:
+    try:
+        return await pipeline.optimize_image(img_url)
+    except Exception as e:
+        return completion_data.CompletionError(completion_data.CompletionErrorType.IMG, str(e))
+
+
 async def get_img_url(
     unsplash_config: config.UnsplashConfig,
     input: completion_data.CompletionInput,
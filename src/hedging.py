@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+from typing import Callable, Optional, TypeVar
+from collections.abc import Coroutine
+import asyncio
+import time
+import latency_tracker
+
+
+@dataclass
+class HedgingConfig:
+    # Latency percentile (0-1) after which a second identical request is sent
+    latency_percentile: float
+    # Max extra tokens spent on hedges, as a fraction of the primary tokens
+    max_extra_token_ratio: float
+    # Samples needed before hedging starts, and how many recent ones are kept
+    min_samples: int = 10
+    window_size: int = 200
+
+
+T = TypeVar("T")
+
+
+class HedgedRequestRunner:
+    hedging_config: HedgingConfig
+    latency_tracker: latency_tracker.LatencyTracker
+    primary_tokens: int
+    hedged_tokens: int
+    hedges_sent: int
+    hedges_won: int
+
+    def __init__(self, hedging_config: HedgingConfig) -> None:
+        self.hedging_config = hedging_config
+        self.latency_tracker = latency_tracker.LatencyTracker(hedging_config.window_size)
+        self.primary_tokens = 0
+        self.hedged_tokens = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    async def run(self, request: Callable[[Callable[[int], bool]], Coroutine[None, None, Optional[T]]], max_tokens: int) -> Optional[T]:
+        """
+        Runs `request` and, if it is still pending after the tracked latency
+        percentile, sends an identical hedge and returns whichever finishes
+        first with a result. The loser is cancelled, but since completions run
+        in an executor thread the HTTP call in flight still finishes and its
+        tokens are counted against the hedging budget.
+
+        `request` gets an `on_attempt(max_tokens)` callback that must be called
+        before every api call, retries included. Each attempt reserves its
+        `max_tokens`, and a hedge attempt that would go over the budget
+        returns False so the hedge stops retrying.
+        """
+        start = time.monotonic()
+
+        primary = asyncio.ensure_future(request(self.__charge_primary))
+        hedge_delay = self.__hedge_delay()
+
+        if hedge_delay is not None:
+            done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+
+            if len(done) == 0 and self.__can_hedge(max_tokens):
+                self.hedges_sent += 1
+
+                hedge = asyncio.ensure_future(request(self.__charge_hedge))
+                result, winner = await first_result([primary, hedge])
+
+                if winner is hedge:
+                    self.hedges_won += 1
+
+                self.__record_primary_latency(primary, start)
+                return result
+
+        result = await primary
+        self.latency_tracker.record(time.monotonic() - start)
+
+        return result
+
+    def __record_primary_latency(self, primary: asyncio.Future, start: float):
+        """
+        Records the primary latency after a hedge. A primary still running
+        when it was cancelled would have taken at least this long, so the
+        elapsed time is kept as a lower bound. Recording the hedge latency
+        instead would lower the percentile and make hedges fire ever sooner.
+        """
+        if not primary.done():
+            self.latency_tracker.record(time.monotonic() - start)
+        elif not primary.cancelled() and primary.exception() is None and primary.result() is not None:
+            self.latency_tracker.record(time.monotonic() - start)
+
+    def __charge_primary(self, tokens: int) -> bool:
+        self.primary_tokens += tokens
+
+        return True
+
+    def __charge_hedge(self, tokens: int) -> bool:
+        if not self.__can_hedge(tokens):
+            return False
+
+        self.hedged_tokens += tokens
+
+        return True
+
+    def __hedge_delay(self) -> Optional[float]:
+        if len(self.latency_tracker.samples) < self.hedging_config.min_samples:
+            return None
+
+        return self.latency_tracker.percentile(self.hedging_config.latency_percentile)
+
+    def __can_hedge(self, max_tokens: int) -> bool:
+        budget = self.primary_tokens * self.hedging_config.max_extra_token_ratio
+
+        return self.hedged_tokens + max_tokens <= budget
+
+
+async def first_result(tasks: list[asyncio.Future]) -> tuple[Optional[T], Optional[asyncio.Future]]:
+    """
+    Waits for the first task that finishes with a non empty result and cancels
+    the rest. Returns (None, None) if every task fails.
+    """
+    pending = set(tasks)
+
+    try:
+        while len(pending) > 0:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                if task.cancelled() or task.exception() is not None:
+                    continue
+
+                result = task.result()
+                if result is not None:
+                    return result, task
+
+        return None, None
+    finally:
+        for task in pending:
+            task.cancel()
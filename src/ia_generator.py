@@ -1,5 +1,6 @@
 import openai
 import asyncio
+from typing import Callable, Optional
 import config
 
 
@@ -11,17 +12,21 @@ class OpenAICompletionService:
         openai.organization = openai_config.organization
         openai.api_key = openai_config.api_key
 
-    async def generate_completion(self, prompt: str, max_tokens=1024, temperature=0.2, presence_penalty=0):
+    async def generate_completion(self, prompt: str, max_tokens=1024, temperature=0.2, presence_penalty=0, model="text-davinci-003", on_attempt: Optional[Callable[[int], bool]] = None):
         _prompt = f"""{prompt}. End string with <end>.
 
     texto:
     """
 
         for _ in range(5):
+            # Lets callers account the tokens of every api call, or stop retrying
+            if on_attempt is not None and not on_attempt(max_tokens):
+                return None
+
             try:
                 loop = asyncio.get_event_loop()
                 answer = await loop.run_in_executor(None, lambda: openai.Completion.create(
-                    model="text-davinci-003",
+                    model=model,
                     prompt=_prompt,
                     max_tokens=max_tokens,
                     temperature=temperature,
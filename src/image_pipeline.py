@@ -0,0 +1,180 @@
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from concurrent import futures
+import requests
+import asyncio
+import sqlite3
+import hashlib
+import io
+import os
+import uuid
+
+
+@dataclass
+class ImageOptimizationConfig:
+    cache_dir: str = "generated/images"
+    # Unsplash "regular" urls are 1080px wide, bigger widths aren't upscaled
+    widths: list[int] = field(default_factory=lambda: [480, 800, 1080])
+    quality: int = 80
+    max_workers: Optional[int] = None
+
+
+# Unsplash adds a per-request tracking id to its image urls, so the same photo
+# comes back with a different url on every /photos/random call
+TRACKING_PARAMS = ["ixid", "ixlib"]
+
+
+class ImagePipeline:
+    """
+    Downloads article images once into a content-addressed cache
+    (`<cache_dir>/<sha256[:2]>/<sha256>-<width>.webp`) and re-encodes them to
+    WebP at the configured widths in a process pool. Source urls, without
+    tracking params, are mapped to their digest in the `image_cache` table so
+    images picked for several articles are reused without downloading them
+    again.
+    """
+    image_config: ImageOptimizationConfig
+    connection: sqlite3.Connection
+    pool: Optional[futures.ProcessPoolExecutor]
+    in_flight: dict[str, asyncio.Future]
+    encoding: dict[str, asyncio.Future]
+
+    def __init__(self, image_config: ImageOptimizationConfig, connection: sqlite3.Connection) -> None:
+        self.image_config = image_config
+        self.connection = connection
+        self.pool = None
+        self.in_flight = dict[str, asyncio.Future]()
+        self.encoding = dict[str, asyncio.Future]()
+
+    async def optimize_image(self, url: str) -> dict[int, str]:
+        cache_key = get_cache_key(url)
+
+        # Articles picking the same image at the same time share the work
+        if cache_key not in self.in_flight:
+            self.in_flight[cache_key] = asyncio.ensure_future(
+                self.__optimize_image(url, cache_key))
+
+        try:
+            return await asyncio.shield(self.in_flight[cache_key])
+        finally:
+            if cache_key in self.in_flight and self.in_flight[cache_key].done():
+                del self.in_flight[cache_key]
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    async def __optimize_image(self, url: str, cache_key: str) -> dict[int, str]:
+        digest = self.__get_cached_digest(cache_key)
+        if digest is not None:
+            paths = self.__get_variant_paths(digest)
+            if all(map(os.path.exists, paths.values())):
+                return paths
+
+        loop = asyncio.get_event_loop()
+        response = await loop.run_in_executor(
+            None,
+            lambda: requests.request("GET", url, timeout=60)
+        )
+
+        if response.status_code != 200:
+            raise Exception(f"Bad request downloading image {url}")
+
+        data = response.content
+        digest = hashlib.sha256(data).hexdigest()
+        paths = self.__get_variant_paths(digest)
+
+        # Different urls can still point to the same image, encode it only once
+        if digest not in self.encoding:
+            self.encoding[digest] = asyncio.ensure_future(
+                self.__encode_variants(data, paths))
+
+        try:
+            await asyncio.shield(self.encoding[digest])
+        finally:
+            if digest in self.encoding and self.encoding[digest].done():
+                del self.encoding[digest]
+
+        self.__save_cached_digest(cache_key, digest)
+
+        return paths
+
+    async def __encode_variants(self, data: bytes, paths: dict[int, str]):
+        missing = {width: path for width, path in paths.items()
+                   if not os.path.exists(path)}
+        if len(missing) == 0:
+            return
+
+        os.makedirs(os.path.dirname(
+            next(iter(missing.values()))), exist_ok=True)
+
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(
+            self.__get_pool(),
+            encode_webp_variants,
+            data,
+            missing,
+            self.image_config.quality
+        )
+
+    def __get_pool(self) -> futures.ProcessPoolExecutor:
+        if self.pool is None:
+            self.pool = futures.ProcessPoolExecutor(
+                max_workers=self.image_config.max_workers)
+
+        return self.pool
+
+    def __get_variant_paths(self, digest: str) -> dict[int, str]:
+        return {
+            width: f"{self.image_config.cache_dir}/{digest[:2]}/{digest}-{width}.webp"
+            for width in self.image_config.widths
+        }
+
+    def __get_cached_digest(self, cache_key: str) -> Optional[str]:
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("""
+        SELECT i.digest FROM image_cache i WHERE i.url = $1
+      """, (cache_key,))
+            row = cursor.fetchone()
+
+            return row[0] if row is not None else None
+        finally:
+            cursor.close()
+
+    def __save_cached_digest(self, cache_key: str, digest: str):
+        with self.connection as cursor:
+            cursor.execute("""
+        INSERT OR REPLACE INTO image_cache VALUES ($1, $2)
+      """, (cache_key, digest))
+
+
+def get_cache_key(url: str) -> str:
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query)
+             if key not in TRACKING_PARAMS]
+
+    return urlunsplit(parts._replace(query=urlencode(sorted(query))))
+
+
+def encode_webp_variants(data: bytes, paths: dict[int, str], quality: int):
+    # Runs in the process pool, so it has to stay a picklable top level function.
+    # Pillow is imported here so it's only needed when image optimization is enabled
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+        for width, path in paths.items():
+            variant = img
+            if img.width > width:
+                height = round(img.height * width / img.width)
+                variant = img.resize((width, height), Image.LANCZOS)
+
+            # Write to a unique temp file first so a crash or a concurrent writer
+            # never leaves a half written cache entry
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            variant.save(tmp_path, "WEBP", quality=quality)
+            os.replace(tmp_path, path)
@@ -0,0 +1,22 @@
+from typing import Optional
+from collections import deque
+import math
+
+
+class LatencyTracker:
+    samples: deque[float]
+
+    def __init__(self, window_size: int) -> None:
+        self.samples = deque(maxlen=window_size)
+
+    def record(self, latency: float):
+        self.samples.append(latency)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self.samples) == 0:
+            return None
+
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(p * len(ordered)) - 1))
+
+        return ordered[index]
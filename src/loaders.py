@@ -2,6 +2,9 @@ from dataclasses import dataclass
 import csv
 import completion_data
 import generator
+import hedging
+import model_router
+import image_pipeline
 
 
 def load_keywords() -> list[completion_data.CompletionInput]:
@@ -36,5 +39,16 @@ def load_completions_config():
         content_prompt_pipe=lambda input: f"""We are a web that makes great and polished articles about petanque in spanish.
         Generate an detailed, eye-catching, SEO optimized web article in html format about "{input.keyword} in spanish. With introduction and headings. Write it in a professional but casual tone. Make important sentences bold.""",
         meta_desc_prompt_pipe=lambda input: f"""Genera un parrafo de metadescripción SEO de menos de 155 caracteres sobre "{input.keyword}".""",
-        meta_title_prompt_pipe=lambda input: f"""Genera un meta-título SEO para la keyword "{input.keyword}" con menos de 57 caracteres y sin separadores."""
+        meta_title_prompt_pipe=lambda input: f"""Genera un meta-título SEO para la keyword "{input.keyword}" con menos de 57 caracteres y sin separadores.""",
+        model_routing=model_router.ModelRoutingConfig(
+            content=model_router.ModelRoute(models=["text-davinci-003"]),
+            meta_title=model_router.ModelRoute(
+                models=["text-curie-001", "text-davinci-003"], max_latency=5),
+            meta_desc=model_router.ModelRoute(
+                models=["text-curie-001", "text-davinci-003"], max_latency=10)
+        ),
+        # Set to e.g. hedging.HedgingConfig(latency_percentile=0.9, max_extra_token_ratio=0.1) to hedge slow article contents
+        hedging_config=None,
+        # Set to image_pipeline.ImageOptimizationConfig() to download and serve images locally as WebP
+        image_optimization=None
     )
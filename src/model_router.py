@@ -0,0 +1,164 @@
+from dataclasses import dataclass
+from typing import Callable, Optional
+from collections import deque
+from collections.abc import Coroutine
+from enum import Enum
+import time
+import latency_tracker
+
+
+class CompletionTask(Enum):
+    CONTENT = 1
+    META_TITLE = 2
+    META_DESC = 3
+
+    def toString(self):
+        return self.name
+
+
+@dataclass
+class ModelRoute:
+    # Models in order of preference, cheapest first. Later ones are fallbacks
+    models: list[str]
+    # Models whose median latency (seconds) goes over this are tried last
+    max_latency: Optional[float] = None
+
+
+@dataclass
+class ModelRoutingConfig:
+    content: ModelRoute
+    meta_title: ModelRoute
+    meta_desc: ModelRoute
+    # Models failing more than this fraction of recent calls are tried last
+    max_error_rate: float = 0.5
+    # Seconds after which a demoted model's stats are reset so it is tried again
+    demotion_cooldown: float = 60
+    min_samples: int = 5
+    window_size: int = 50
+
+
+class ModelStats:
+    latency_tracker: latency_tracker.LatencyTracker
+    outcomes: deque[bool]
+    demoted_at: Optional[float]
+
+    def __init__(self, window_size: int) -> None:
+        self.latency_tracker = latency_tracker.LatencyTracker(window_size)
+        self.outcomes = deque(maxlen=window_size)
+        self.demoted_at = None
+
+    def reset(self):
+        self.latency_tracker.samples.clear()
+        self.outcomes.clear()
+        self.demoted_at = None
+
+    def record(self, latency: float, success: bool):
+        self.outcomes.append(success)
+        if success:
+            self.latency_tracker.record(latency)
+
+    def error_rate(self) -> float:
+        if len(self.outcomes) == 0:
+            return 0
+
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def median_latency(self) -> Optional[float]:
+        return self.latency_tracker.percentile(0.5)
+
+
+class ModelRouter:
+    routing_config: ModelRoutingConfig
+    # Keyed by task too, each route judges models on its own calls only
+    stats: dict[tuple[CompletionTask, str], ModelStats]
+
+    def __init__(self, routing_config: ModelRoutingConfig) -> None:
+        self.routing_config = routing_config
+        self.stats = dict[tuple[CompletionTask, str], ModelStats]()
+
+    def get_route(self, task: CompletionTask) -> ModelRoute:
+        match task:
+            case CompletionTask.CONTENT:
+                return self.routing_config.content
+            case CompletionTask.META_TITLE:
+                return self.routing_config.meta_title
+            case CompletionTask.META_DESC:
+                return self.routing_config.meta_desc
+            case _:
+                raise Exception("Invalid completion task")
+
+    def select_models(self, task: CompletionTask) -> list[str]:
+        """
+        Returns the models of the task route in the order they should be
+        tried. The configured order is kept unless a model has been failing
+        or is slower than the route allows, in which case it goes last.
+        Demoted models rarely run again, so their stats are reset after
+        `demotion_cooldown` seconds to let them recover.
+        """
+        route = self.get_route(task)
+        self.__expire_demotions(task, route)
+
+        def rank(indexed_model: tuple[int, str]):
+            index, model = indexed_model
+            unhealthy, too_slow = self.__get_health(task, route, model)
+
+            return (unhealthy, too_slow, index)
+
+        return [model for _, model in sorted(enumerate(route.models), key=rank)]
+
+    async def complete(self, task: CompletionTask, request: Callable[[str], Coroutine[None, None, Optional[str]]]) -> str:
+        """
+        Runs `request` with each selected model until one of them returns a
+        completion, recording latency and errors for every attempt.
+        """
+        for model in self.select_models(task):
+            start = time.monotonic()
+            try:
+                completion = await request(model)
+            except Exception as e:
+                print(f"Error ocurred in {model} completion: ", e)
+                completion = None
+
+            self.__record(task, model, time.monotonic() - start,
+                          completion is not None)
+
+            if completion is not None:
+                return completion
+
+        raise Exception(f"No model could complete {task.toString()}")
+
+    def __get_health(self, task: CompletionTask, route: ModelRoute, model: str) -> tuple[bool, bool]:
+        """
+        Returns whether the model is (unhealthy, too_slow) for the task.
+        """
+        stats = self.stats.get((task, model))
+
+        if stats is None or len(stats.outcomes) < self.routing_config.min_samples:
+            return (False, False)
+
+        unhealthy = stats.error_rate() > self.routing_config.max_error_rate
+        latency = stats.median_latency()
+        too_slow = route.max_latency is not None and latency is not None and latency > route.max_latency
+
+        return (unhealthy, too_slow)
+
+    def __expire_demotions(self, task: CompletionTask, route: ModelRoute):
+        for model in route.models:
+            stats = self.stats.get((task, model))
+
+            if stats is not None and stats.demoted_at is not None and time.monotonic() - stats.demoted_at >= self.routing_config.demotion_cooldown:
+                stats.reset()
+
+    def __record(self, task: CompletionTask, model: str, latency: float, success: bool):
+        key = (task, model)
+        if key not in self.stats:
+            self.stats[key] = ModelStats(self.routing_config.window_size)
+
+        stats = self.stats[key]
+        stats.record(latency, success)
+
+        # The cooldown starts when the model is first demoted
+        if not any(self.__get_health(task, self.get_route(task), model)):
+            stats.demoted_at = None
+        elif stats.demoted_at is None:
+            stats.demoted_at = time.monotonic()
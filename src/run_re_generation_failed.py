@@ -30,4 +30,7 @@ async def main():
     await article_generator.regenerate_articles()
 
 
-asyncio.run(main())
+# The image pipeline process pool re-imports this module in its workers
+# under the spawn/forkserver start methods, so don't start a run on import
+if __name__ == "__main__":
+    asyncio.run(main())
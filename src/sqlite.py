@@ -20,5 +20,64 @@ def run_migrations(con: sqlite3.Connection):
           img_url VARCHAR,
           img_attribution_username VARCHAR,
           errors JSON,
-          prompts JSON NOT NULL
+          prompts JSON NOT NULL,
+          img_local_paths JSON
           )""")
+
+        # Databases created before img_local_paths existed
+        columns = cursor.execute(
+            "PRAGMA table_info(article_completions)").fetchall()
+        if "img_local_paths" not in map(lambda x: x[1], columns):
+            cursor.execute(
+                "ALTER TABLE article_completions ADD COLUMN img_local_paths JSON")
+
+        cursor.execute("""CREATE TABLE IF NOT EXISTS image_cache(
+          url VARCHAR NOT NULL PRIMARY KEY,
+          digest VARCHAR NOT NULL
+          )""")
+
+        # The first search index was an external content table joined on the
+        # article rowid, which a VACUUM can renumber. Replace it if still there
+        search_index_columns = cursor.execute(
+            "PRAGMA table_info(article_completions_fts)").fetchall()
+        search_index_exists = len(search_index_columns) > 0
+        if search_index_exists and "keyword" not in map(lambda x: x[1], search_index_columns):
+            cursor.execute("DROP TRIGGER IF EXISTS article_completions_fts_insert")
+            cursor.execute("DROP TRIGGER IF EXISTS article_completions_fts_delete")
+            cursor.execute("DROP TRIGGER IF EXISTS article_completions_fts_update")
+            cursor.execute("DROP TABLE article_completions_fts")
+            search_index_exists = False
+
+        # Full-text index over the articles, kept in sync by the triggers below
+        cursor.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS article_completions_fts USING fts5(
+          keyword UNINDEXED,
+          title,
+          meta_title,
+          cleaned_content,
+          tokenize='unicode61 remove_diacritics 2'
+          )""")
+        cursor.execute("""CREATE TRIGGER IF NOT EXISTS article_completions_fts_insert AFTER INSERT ON article_completions BEGIN
+          INSERT INTO article_completions_fts(keyword, title, meta_title, cleaned_content)
+          VALUES (new.keyword, new.title, new.meta_title, new.cleaned_content);
+          END""")
+        cursor.execute("""CREATE TRIGGER IF NOT EXISTS article_completions_fts_delete AFTER DELETE ON article_completions BEGIN
+          DELETE FROM article_completions_fts WHERE keyword = old.keyword;
+          END""")
+        cursor.execute("""CREATE TRIGGER IF NOT EXISTS article_completions_fts_update AFTER UPDATE ON article_completions BEGIN
+          DELETE FROM article_completions_fts WHERE keyword = old.keyword;
+          INSERT INTO article_completions_fts(keyword, title, meta_title, cleaned_content)
+          VALUES (new.keyword, new.title, new.meta_title, new.cleaned_content);
+          END""")
+
+        # Index the articles generated before the search index existed
+        if not search_index_exists:
+            rebuild_search_index(con)
+
+
+def rebuild_search_index(con: sqlite3.Connection):
+    with con as cursor:
+        cursor.execute("DELETE FROM article_completions_fts")
+        cursor.execute("""
+          INSERT INTO article_completions_fts(keyword, title, meta_title, cleaned_content)
+          SELECT a.keyword, a.title, a.meta_title, a.cleaned_content FROM article_completions a
+          """)